@@ -113,6 +113,7 @@ aws cloudformation deploy \
         YnabCategoryId="$YNAB_CATEGORY_ID" \
         KwhRate="$KWH_RATE" \
         HealthcheckUrl="${HEALTHCHECK_URL:-}" \
+        SkipAfterDay="${SKIP_AFTER_DAY:-3}" \
     --region "$AWS_REGION"
 
 # Get stack outputs
@@ -1,15 +1,26 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import heapq
 import logging
 import asyncio
 import json
+import tempfile
 from datetime import datetime, timedelta
-from typing import List
+from pathlib import Path
+from typing import TYPE_CHECKING, List
 from collections import defaultdict
 
-import aiohttp
-import ynab
-from smart_meter_texas import Account, Client, ClientSSLContext, Meter
-from settings import SMTConfig
-from models import MonthlyBillingDataResponse
+from settings import get_config
+from models import parse_smt_date
+
+# aiohttp, ynab and smart_meter_texas are imported where they are first used,
+# so cold starts that end at the monthly skip check never load them
+if TYPE_CHECKING:
+    import aiohttp
+    import ynab
+    from smart_meter_texas import Client, Meter
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -17,34 +28,144 @@ logger.setLevel(logging.INFO)
 __author__ = "Noah Guillory"
 __version__ = "0.2.0"
 
-# Load config from environment variables
-config = SMTConfig()  # type: ignore
-ynab_configuration = ynab.Configuration(access_token=config.ynab_access_token)
-current_kwh_rate = config.kwh_rate
 
+# /tmp survives between warm invocations, so the last target written to YNAB
+# and the month of the last successful run are remembered there.
+STATE_FILE = Path(tempfile.gettempdir()) / "smt-data-exporter-state.json"
+
+# Kept at module scope so warm invocations reuse pooled connections.
+# The event loop has to outlive each invocation too, since an aiohttp
+# session is bound to the loop it was created on.
+_LOOP: asyncio.AbstractEventLoop | None = None
+_SESSION: aiohttp.ClientSession | None = None
+
+# The SMT client keeps its auth token and SSL context, and the meter ID
+# never changes, so both are cached until a report request fails.
+_SMT_CLIENT: Client | None = None
+_METER_ID: str | None = None
+_SMT_LOCK = asyncio.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop shared across invocations in this container.
+    """
+    global _LOOP
+    if _LOOP is None or _LOOP.is_closed():
+        _LOOP = asyncio.new_event_loop()
+    return _LOOP
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared HTTP session, creating it on first use.
+    """
+    import aiohttp
+
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        # Only SMT and the healthcheck host are contacted, so a small pool
+        # with long-lived DNS entries and keepalives covers warm invocations
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=10,
+                limit_per_host=5,
+                use_dns_cache=True,
+                ttl_dns_cache=3600,
+                keepalive_timeout=300,
+                enable_cleanup_closed=True,
+            )
+        )
+    return _SESSION
+
+
+def _close_session() -> None:
+    """
+    Close the shared session and event loop when the container shuts down.
+    """
+    if _LOOP is None or _LOOP.is_closed():
+        return
+    if _SESSION is not None and not _SESSION.closed:
+        _LOOP.run_until_complete(_SESSION.close())
+    _LOOP.close()
+
+
+atexit.register(_close_session)
+
+
+HEALTHCHECK_LABELS = {
+    "": "Healthcheck ping",
+    "/start": "Healthcheck start ping",
+    "/fail": "Healthcheck failure ping",
+}
+
+
+@functools.cache
+def healthcheck_urls() -> dict[str, str]:
+    """
+    Return the healthcheck URLs keyed by endpoint suffix ("", "/start", "/fail").
+    Empty when no healthcheck URL is configured.
+    """
+    base_url = get_config().healthcheck_url
+    if not base_url:
+        return {}
+    return {suffix: f"{base_url}{suffix}" for suffix in HEALTHCHECK_LABELS}
+
+
+@functools.cache
+def get_categories_api() -> ynab.CategoriesApi:
+    """
+    Return the YNAB categories API client.
+    Built once per container so its urllib3 pool to api.ynab.com stays warm.
+    """
+    import ynab
+
+    ynab_configuration = ynab.Configuration(
+        access_token=get_config().ynab_access_token
+    )
+    return ynab.CategoriesApi(ynab.ApiClient(ynab_configuration))
+
+
+async def _get_smt_client(session: aiohttp.ClientSession) -> tuple[Client, str]:
+    """
+    Return an authenticated SMT client and the ESIID of the account's first meter.
+    Only the first call in a container pays for SSL setup, login and the meter lookup.
+    """
+    from smart_meter_texas import Account, Client, ClientSSLContext
+
+    global _SMT_CLIENT, _METER_ID
+    async with _SMT_LOCK:
+        if _SMT_CLIENT is None or _SMT_CLIENT.websession is not session:
+            client_ssl_ctx = ClientSSLContext()
+            ssl_context = await client_ssl_ctx.get_ssl_context()
+            if not ssl_context:
+                raise RuntimeError("Failed to create SSL context")
+            config = get_config()
+            account = Account(config.smt_username, config.smt_password)
+            client = Client(session, account, ssl_context)
+            await client.authenticate()
+            meters: List[Meter] = await account.fetch_meters(client)
+            if not meters:
+                raise RuntimeError("No meters found for account.")
+            _SMT_CLIENT, _METER_ID = client, meters[0].esiid
+        return _SMT_CLIENT, _METER_ID
 
-async def get_monthly_report() -> MonthlyBillingDataResponse:
+
+async def get_monthly_report(
+    session: aiohttp.ClientSession,
+) -> dict:
     """
     Fetch monthly billing report from Smart Meter Texas API.
+    Returns the raw JSON payload; see MonthlyBillingDataResponse for its shape.
     """
-    client_ssl_ctx = ClientSSLContext()
-    ssl_context = await client_ssl_ctx.get_ssl_context()
-    if not ssl_context:
-        raise RuntimeError("Failed to create SSL context")
-
-    async with aiohttp.ClientSession() as websession:
-        account = Account(config.smt_username, config.smt_password)
-        client = Client(websession, account, ssl_context)
-        await client.authenticate()
-        meters: List[Meter] = await account.fetch_meters(client)
-        if not meters:
-            raise RuntimeError("No meters found for account.")
-        meter_id = meters[0].esiid
-        # Calculate start and end dates: start is one year ago today, end is today
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        start_date_str = start_date.strftime("%m/%d/%Y")
-        end_date_str = end_date.strftime("%m/%d/%Y")
+    global _SMT_CLIENT, _METER_ID
+    client, meter_id = await _get_smt_client(session)
+    # Calculate start and end dates: start is one year ago today, end is today
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=365)
+    start_date_str = start_date.strftime("%m/%d/%Y")
+    end_date_str = end_date.strftime("%m/%d/%Y")
+    try:
         response = await client.request(
             "/adhoc/monthlysynch",
             json={
@@ -57,117 +178,177 @@ async def get_monthly_report() -> MonthlyBillingDataResponse:
                 "versionBillingMonth": None,
             },
         )
-        return MonthlyBillingDataResponse.model_validate(response)
+    except Exception:
+        # The client only re-authenticates on a 401 once its own token timer
+        # runs out, so a failed request drops it and the next call logs in again
+        if _SMT_CLIENT is client:
+            _SMT_CLIENT = _METER_ID = None
+        raise
+    return response
 
 
-def calculate_trailing_12_month_average(report: MonthlyBillingDataResponse) -> float:
+def extract_month_totals(response: dict) -> dict[int, float]:
     """
-    Calculate the trailing 12-month average kWh usage from the API response object.
-    Returns the average for the latest month in the dataset.
-    Uses pure Python instead of pandas.
+    Sum actual kWh per month straight from the raw monthly report JSON.
+    Months are keyed by year * 12 + month - 1, so keys sort chronologically.
+    Skips pydantic validation since only startDate and actualkWh are needed,
+    but a startDate that isn't MM/DD/YYYY still raises ValueError.
     """
-    billing_data = report.data.billing_data
-    if not billing_data:
-        return 0.0
-    
-    # Group data by month (YYYY-MM format)
     monthly_usage = defaultdict(float)
-    for bd in billing_data:
-        month_key = bd.start_date.strftime("%Y-%m")
-        monthly_usage[month_key] += bd.actual_kwh
-    
-    # Sort months chronologically
-    sorted_months = sorted(monthly_usage.items())
-    
-    if not sorted_months:
-        return 0.0
-    
-    # Calculate trailing 12-month averages for each month
-    trailing_averages = {}
-    for i in range(len(sorted_months)):
-        month, _ = sorted_months[i]
-        # Get the last 12 months including current month
-        start_idx = max(0, i - 11)
-        window_data = sorted_months[start_idx:i + 1]
-        
-        if len(window_data) >= 12:
-            avg_kwh = sum(kwh for _, kwh in window_data) / 12
-            trailing_averages[month] = avg_kwh
-    
-    if not trailing_averages:
+    for entry in response["data"]["billingData"]:
+        start_date = parse_smt_date(entry["startDate"])
+        month_key = start_date.year * 12 + start_date.month - 1
+        monthly_usage[month_key] += float(entry["actualkWh"])
+    return monthly_usage
+
+
+def average_month_totals(monthly_usage: dict[int, float]) -> float:
+    """
+    Calculate the trailing 12-month average kWh usage from per-month totals.
+    Returns the average for the latest month, or 0.0 with under 12 months of data.
+    """
+    if len(monthly_usage) < 12:
         # If we don't have 12 months of data yet, return 0
         return 0.0
     
-    # Get the latest month's trailing average
-    latest_month = sorted_months[-1][0]
-    latest_avg = trailing_averages.get(latest_month, 0.0)
-    
-    return float(latest_avg)
+    # Only the latest month's window is needed, so pick the 12 most recent
+    # months without sorting the rest
+    latest_months = heapq.nlargest(12, monthly_usage.items())
+    return sum(kwh for _, kwh in latest_months) / 12.0
 
 
-def update_electric_bill_target(trailing_avg_kwh: float) -> None:
+def load_state() -> dict:
     """
-    Update the YNAB electric bill target category based on trailing average kWh usage.
+    Load the state saved by a previous invocation in this container, if any.
+    """
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict) -> None:
+    """
+    Persist state for later invocations. Failures are logged, not raised.
     """
-    target = trailing_avg_kwh * current_kwh_rate
-    goal_target = int(target * 1000)  # YNAB uses milliunits
-    note = (
-        f"Updated on {datetime.now().strftime('%Y-%m-%d')} to ${target:.2f} "
-        f"based on {trailing_avg_kwh:.2f} kWh usage."
-    )
     try:
-        with ynab.ApiClient(ynab_configuration) as api_client:
-            categories_api = ynab.CategoriesApi(api_client)
-            budget_id = config.ynab_budget_id
-            category_id = config.ynab_category_id
+        STATE_FILE.write_text(json.dumps(state))
+    except OSError as e:
+        logger.warning("Failed to save state to %s: %s", STATE_FILE, e)
+
+
+def update_category_targets(updates: List[tuple[str, int, str]]) -> bool:
+    """
+    Apply (category_id, goal_target, note) updates to the configured YNAB budget.
+    YNAB has no bulk category endpoint, so each update is its own PATCH, but all
+    of them share the module's ApiClient and its connection pool.
+    Returns True if every category was updated.
+    """
+    import ynab
+
+    budget_id = get_config().ynab_budget_id
+    categories_api = get_categories_api()
+    try:
+        for category_id, goal_target, note in updates:
             data = ynab.PatchCategoryWrapper(
                 category=ynab.SaveCategory(
                     goal_target=goal_target,
                     note=note,
                 )
             )
-            logger.info(
-                f"Setting target to ${target:.2f} based on {trailing_avg_kwh:.2f} kWh usage."
-            )
             response = categories_api.update_category(
                 budget_id=budget_id, category_id=category_id, data=data
             )
-            logger.info(f"Category update response: {response}")
+            logger.info("Category update response: %s", response)
+        return True
     except Exception as e:
-        logger.error(f"Failed to update YNAB category: {e}")
+        logger.error("Failed to update YNAB category: %s", e)
+        return False
+
+
+def goal_target_milliunits(trailing_avg_kwh: float) -> int:
+    """
+    Convert a trailing average kWh usage to a YNAB goal target in milliunits.
+    """
+    return int(trailing_avg_kwh * get_config().kwh_rate * 1000)
+
+
+def update_electric_bill_target(trailing_avg_kwh: float) -> bool:
+    """
+    Update the YNAB electric bill target category based on trailing average kWh usage.
+    Returns True if the category was updated.
+    """
+    config = get_config()
+    target = trailing_avg_kwh * config.kwh_rate
+    goal_target = goal_target_milliunits(trailing_avg_kwh)
+    note = (
+        f"Updated on {datetime.now().strftime('%Y-%m-%d')} to ${target:.2f} "
+        f"based on {trailing_avg_kwh:.2f} kWh usage."
+    )
+    logger.info(
+        "Setting target to $%.2f based on %.2f kWh usage.", target, trailing_avg_kwh
+    )
+    return update_category_targets([(config.ynab_category_id, goal_target, note)])
+
+
+def already_ran_this_month(now: datetime) -> bool:
+    """
+    Check whether this container already completed a run this month.
+    Runs on or before the configured skip_after_day always go ahead, since SMT
+    may still be posting the previous billing period.
+    """
+    if now.day <= get_config().skip_after_day:
+        return False
+    return load_state().get("last_success_month") == now.strftime("%Y-%m")
 
 
-async def process_data() -> dict:
+async def process_data(session: aiohttp.ClientSession) -> dict:
     """
     Main processing logic for the Lambda function.
     """
+    kwh_rate = get_config().kwh_rate
+    # The start ping runs alongside the SMT request instead of ahead of it
+    start_ping = asyncio.create_task(ping_healthcheck(session, "/start"))
     try:
-        await ping_healthcheck_start()
-        
-        # In Lambda, we don't use file-based markers
-        # EventBridge rules should be configured to run monthly
-        report_data = await get_monthly_report()
+        response = await get_monthly_report(session)
         logger.info("Download completed.")
         
-        average = calculate_trailing_12_month_average(report_data)
-        logger.info(f"Calculated trailing 12-month average: {average:.2f} kWh")
+        average = average_month_totals(extract_month_totals(response))
+        logger.info("Calculated trailing 12-month average: %.2f kWh", average)
+        
+        goal_target = goal_target_milliunits(average)
+        state = load_state()
+        if state.get("goal_target") == goal_target:
+            # YNAB already holds this target, so the PATCH would be a no-op
+            logger.info("YNAB target unchanged since last update. Skipping YNAB update.")
+        else:
+            # The YNAB client is blocking; a worker thread keeps the loop free
+            # for the in-flight healthcheck ping
+            if not await asyncio.to_thread(update_electric_bill_target, average):
+                # Reported through the failure path below: 500 and a /fail ping
+                raise RuntimeError("Failed to update YNAB electric bill target")
+            logger.info("YNAB electric bill target updated.")
+            state["goal_target"] = goal_target
         
-        update_electric_bill_target(average)
-        logger.info("YNAB electric bill target updated.")
+        state["last_success_month"] = datetime.now().strftime("%Y-%m")
+        save_state(state)
         
-        await ping_healthcheck()
+        # The start ping has to land before the final one
+        await start_ping
+        await ping_healthcheck(session)
         
         return {
             "statusCode": 200,
             "body": json.dumps({
                 "message": "Successfully updated YNAB electric bill target",
                 "trailing_avg_kwh": average,
-                "target_amount": average * current_kwh_rate
+                "target_amount": average * kwh_rate
             })
         }
     except Exception as e:
-        logger.error(f"Error: {e}", exc_info=True)
-        await ping_healthcheck_failed()
+        logger.error("Error: %s", e, exc_info=True)
+        await start_ping
+        await ping_healthcheck(session, "/fail")
         return {
             "statusCode": 500,
             "body": json.dumps({
@@ -176,64 +357,30 @@ async def process_data() -> dict:
         }
 
 
-async def ping_healthcheck() -> None:
+async def ping_healthcheck(
+    session: aiohttp.ClientSession, suffix: str = ""
+) -> None:
     """
     Ping the healthcheck URL if configured.
+    Pass suffix "/start" or "/fail" to hit the start or failure endpoint.
     """
-    if config.healthcheck_url:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    config.healthcheck_url, timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        logger.info("Healthcheck ping successful.")
-                    else:
-                        logger.error(
-                            f"Healthcheck ping failed with status code {resp.status}."
-                        )
-        except Exception as e:
-            logger.error(f"Healthcheck ping failed: {e}")
+    import aiohttp
 
-
-async def ping_healthcheck_start():
-    """
-    Ping the healthcheck URL start endpoint if configured.
-    """
-    if config.healthcheck_url:
+    url = healthcheck_urls().get(suffix)
+    if url:
+        label = HEALTHCHECK_LABELS[suffix]
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{config.healthcheck_url}/start", timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        logger.info("Healthcheck start ping successful.")
-                    else:
-                        logger.error(
-                            f"Healthcheck start ping failed with status code {resp.status}."
-                        )
+            async with session.get(
+                url, timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                if resp.status == 200:
+                    logger.info("%s successful.", label)
+                else:
+                    logger.error(
+                        "%s failed with status code %s.", label, resp.status
+                    )
         except Exception as e:
-            logger.error(f"Healthcheck start ping failed: {e}")
-
-
-async def ping_healthcheck_failed():
-    """
-    Ping the healthcheck URL failure endpoint if configured.
-    """
-    if config.healthcheck_url:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{config.healthcheck_url}/fail", timeout=aiohttp.ClientTimeout(total=10)
-                ) as resp:
-                    if resp.status == 200:
-                        logger.info("Healthcheck failure ping successful.")
-                    else:
-                        logger.error(
-                            f"Healthcheck failure ping failed with status code {resp.status}."
-                        )
-        except Exception as e:
-            logger.error(f"Healthcheck failure ping failed: {e}")
+            logger.error("%s failed: %s", label, e)
 
 
 def lambda_handler(event, context):
@@ -248,9 +395,25 @@ def lambda_handler(event, context):
     Returns:
         dict: Response with status code and body
     """
-    logger.info(f"Lambda function invoked with event: {json.dumps(event)}")
+    logger.info("Lambda function invoked with event: %s", json.dumps(event))
+    
+    # Run on the shared loop so the session survives into warm invocations
+    loop = _get_loop()
+    
+    if already_ran_this_month(datetime.now()):
+        logger.info("Already updated this month. Skipping.")
+        # Still report success so a monitor expecting every run stays green
+        if healthcheck_urls():
+            session = loop.run_until_complete(_get_session())
+            loop.run_until_complete(ping_healthcheck(session))
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "Already updated this month; skipped"
+            })
+        }
     
-    # Run the async processing function
-    result = asyncio.run(process_data())
+    session = loop.run_until_complete(_get_session())
+    result = loop.run_until_complete(process_data(session))
     
     return result
@@ -1,20 +1,18 @@
+import csv
 import logging
 import asyncio
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List
+from collections import deque
+from itertools import groupby
 
 import aiohttp
-import pandas as pd
 import ynab
 from smart_meter_texas import Account, Client, ClientSSLContext, Meter
-from settings import SMTConfig
+from settings import get_config
 from models import MonthlyBillingDataResponse
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 __author__ = "Noah Guillory"
@@ -22,13 +20,6 @@ __version__ = "0.1.0"
 
 # Constants
 DATA_DIR = Path(__file__).parent / "data"
-DATA_DIR.mkdir(exist_ok=True)
-
-
-# Load config from environment variables
-config = SMTConfig()  # type: ignore
-ynab_configuration = ynab.Configuration(access_token=config.ynab_access_token)
-current_kwh_rate = config.kwh_rate
 
 
 async def get_monthly_report() -> MonthlyBillingDataResponse:
@@ -41,6 +32,7 @@ async def get_monthly_report() -> MonthlyBillingDataResponse:
         raise RuntimeError("Failed to create SSL context")
 
     async with aiohttp.ClientSession() as websession:
+        config = get_config()
         account = Account(config.smt_username, config.smt_password)
         client = Client(websession, account, ssl_context)
         await client.authenticate()
@@ -76,40 +68,41 @@ def calculate_trailing_12_month_average(report: MonthlyBillingDataResponse) -> f
     billing_data = report.data.billing_data
     if not billing_data:
         return 0.0
-    df = pd.DataFrame(
-        [
-            {"Start date": bd.start_date, "Actual kWh": bd.actual_kwh}
-            for bd in billing_data
-        ]
-    )
-    df["Start date"] = pd.to_datetime(df["Start date"])
-    monthly_usage = (
-        df.groupby(df["Start date"].dt.to_period("M"))["Actual kWh"].sum().reset_index()
-    )
-    monthly_usage.columns = ["Month", "Total kWh"]
-    monthly_usage.set_index("Month", inplace=True)
-    monthly_usage["Trailing 12-Month Avg kWh"] = (
-        monthly_usage["Total kWh"].rolling(window=12).mean()
+
+    # Sum each run of same-month rows in date order; SMT already returns them
+    # nearly sorted. Only the latest 12 totals are kept, older ones fall off
+    # the bounded deque.
+    rows = sorted(billing_data, key=lambda b: b.start_date)
+    month_totals = deque(
+        (
+            sum(bd.actual_kwh for bd in month_rows)
+            for _, month_rows in groupby(
+                rows, key=lambda b: (b.start_date.year, b.start_date.month)
+            )
+        ),
+        maxlen=12,
     )
-    latest_month = monthly_usage.index.max()
-    latest_avg = monthly_usage.loc[latest_month, "Trailing 12-Month Avg kWh"]
-    if pd.isna(latest_avg):
+
+    if len(month_totals) < 12:
+        # If we don't have 12 months of data yet, return 0
         return 0.0
-    # Ensure conversion to float using pandas utility
-    return float(pd.to_numeric(latest_avg, errors="coerce"))
+
+    return sum(month_totals) / 12.0
 
 
 def update_electric_bill_target(trailing_avg_kwh: float) -> None:
     """
     Update the YNAB electric bill target category based on trailing average kWh usage.
     """
-    target = trailing_avg_kwh * current_kwh_rate
+    config = get_config()
+    target = trailing_avg_kwh * config.kwh_rate
     goal_target = int(target * 1000)  # YNAB uses milliunits
     note = (
         f"Updated on {datetime.now().strftime('%Y-%m-%d')} to ${target:.2f} "
         f"based on {trailing_avg_kwh:.2f} kWh usage."
     )
     try:
+        ynab_configuration = ynab.Configuration(access_token=config.ynab_access_token)
         with ynab.ApiClient(ynab_configuration) as api_client:
             categories_api = ynab.CategoriesApi(api_client)
             budget_id = config.ynab_budget_id
@@ -121,14 +114,16 @@ def update_electric_bill_target(trailing_avg_kwh: float) -> None:
                 )
             )
             logger.info(
-                f"Setting target to ${target:.2f} based on {trailing_avg_kwh:.2f} kWh usage."
+                "Setting target to $%.2f based on %.2f kWh usage.",
+                target,
+                trailing_avg_kwh,
             )
             response = categories_api.update_category(
                 budget_id=budget_id, category_id=category_id, data=data
             )
-            logger.info(f"Category update response: {response}")
+            logger.info("Category update response: %s", response)
     except Exception as e:
-        logger.error(f"Failed to update YNAB category: {e}")
+        logger.error("Failed to update YNAB category: %s", e)
 
 
 async def main() -> None:
@@ -136,9 +131,9 @@ async def main() -> None:
     Main entry point for the script.
     """
     try:
-        await ping_healthcheck_start()
+        await ping_healthcheck("/start")
         current_month = datetime.now().strftime("%Y-%m")
-        export_marker = Path(__file__).parent / "data" / f"exported_{current_month}.csv"
+        export_marker = DATA_DIR / f"exported_{current_month}.csv"
         if check_export_marker(export_marker, current_month):
             await ping_healthcheck()
             return
@@ -150,8 +145,8 @@ async def main() -> None:
         save_export_marker(export_marker, report_data)
         await ping_healthcheck()
     except Exception as e:
-        logger.error(f"Error: {e}")
-        await ping_healthcheck_failed()
+        logger.error("Error: %s", e)
+        await ping_healthcheck("/fail")
 
 
 def check_export_marker(export_marker: Path, current_month: str) -> bool:
@@ -159,7 +154,7 @@ def check_export_marker(export_marker: Path, current_month: str) -> bool:
     Check if export marker file exists for the current month. Log and return True if exists, else False.
     """
     if export_marker.exists():
-        logger.info(f"Export for {current_month} already completed. No-op.")
+        logger.info("Export for %s already completed. No-op.", current_month)
         return True
     return False
 
@@ -172,66 +167,39 @@ def save_export_marker(
     """
     billing_data = report_data.data.billing_data
     if billing_data:
-        df = pd.DataFrame(
-            [
-                {
-                    "Start date": bd.start_date.strftime("%Y-%m-%d"),
-                    "Actual kWh": bd.actual_kwh,
-                }
-                for bd in billing_data
-            ]
-        )
-        df.to_csv(export_marker, index=False)
-        logger.info(f"Export marker saved: {export_marker}")
+        # Created on first write rather than at import
+        export_marker.parent.mkdir(exist_ok=True)
+        with export_marker.open("w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Start date", "Actual kWh"])
+            for bd in billing_data:
+                writer.writerow([bd.start_date.strftime("%Y-%m-%d"), bd.actual_kwh])
+        logger.info("Export marker saved: %s", export_marker)
 
 
-async def ping_healthcheck() -> None:
+async def ping_healthcheck(suffix: str = "") -> None:
     """
     Ping the healthcheck URL if configured.
+    Pass suffix "/start" or "/fail" to hit the start or failure endpoint.
     """
+    config = get_config()
     if config.healthcheck_url:
         async with aiohttp.ClientSession() as session:
             async with session.get(
-                config.healthcheck_url, timeout=aiohttp.ClientTimeout(total=10)
+                f"{config.healthcheck_url}{suffix}",
+                timeout=aiohttp.ClientTimeout(total=10),
             ) as resp:
                 if resp.status == 200:
                     logger.info("Healthcheck ping successful.")
                 else:
                     logger.error(
-                        f"Healthcheck ping failed with status code {resp.status}."
+                        "Healthcheck ping failed with status code %s.", resp.status
                     )
 
-async def ping_healthcheck_start():
-    """
-    Ping the healthcheck URL if configured.
-    """
-    if config.healthcheck_url:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{config.healthcheck_url}/start", timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                if resp.status == 200:
-                    logger.info("Healthcheck ping successful.")
-                else:
-                    logger.error(
-                        f"Healthcheck ping failed with status code {resp.status}."
-                    )
-
-async def ping_healthcheck_failed():
-    """
-    Ping the healthcheck URL if configured.
-    """
-    if config.healthcheck_url:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{config.healthcheck_url}/fail", timeout=aiohttp.ClientTimeout(total=10)
-            ) as resp:
-                if resp.status == 200:
-                    logger.info("Healthcheck ping successful.")
-                else:
-                    logger.error(
-                        f"Healthcheck ping failed with status code {resp.status}."
-                    )
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
     asyncio.run(main())
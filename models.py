@@ -1,7 +1,28 @@
+import re
 from datetime import datetime
 from typing import List
 from pydantic import BaseModel, Field, field_validator
 
+# SMT dates are MM/DD/YYYY and timestamps MM/DD/YYYY HH:MM:SS. Like strptime,
+# single-digit fields are accepted; anything else is rejected so a format
+# change from SMT fails loudly.
+_DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})", re.ASCII)
+_TIMESTAMP_RE = re.compile(
+    r"(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}):(\d{1,2}):(\d{1,2})", re.ASCII
+)
+
+
+def parse_smt_date(value: str) -> datetime:
+    """
+    Parse an SMT MM/DD/YYYY date string.
+    Raises ValueError for any other layout or an out-of-range field.
+    """
+    match = _DATE_RE.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Expected MM/DD/YYYY date, got {value!r}")
+    month, day, year = map(int, match.groups())
+    return datetime(year, month, day)
+
 
 class BillingData(BaseModel):
     """
@@ -21,19 +42,23 @@ class BillingData(BaseModel):
 
     @field_validator("start_date", "end_date", mode="before")
     def parse_dates(cls, value):
-        """Parse date strings to datetime objects."""
+        """Parse MM/DD/YYYY date strings to datetime objects."""
         if isinstance(value, str):
-            return datetime.strptime(value, "%m/%d/%Y")
+            return parse_smt_date(value)
         return value
 
     @field_validator("revision_date", mode="before")
     def parse_timestamps(cls, value):
-        """Parse timestamp strings to datetime objects."""
-        return (
-            datetime.strptime(value, "%m/%d/%Y %H:%M:%S")
-            if isinstance(value, str)
-            else value
-        )
+        """Parse MM/DD/YYYY HH:MM:SS timestamp strings to datetime objects."""
+        if isinstance(value, str):
+            match = _TIMESTAMP_RE.fullmatch(value)
+            if match is None:
+                raise ValueError(
+                    f"Expected MM/DD/YYYY HH:MM:SS timestamp, got {value!r}"
+                )
+            month, day, year, hour, minute, second = map(int, match.groups())
+            return datetime(year, month, day, hour, minute, second)
+        return value
 
 
 class Data(BaseModel):
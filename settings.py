@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic import Field
 from pydantic_settings import (
     BaseSettings,
@@ -16,4 +18,12 @@ class SMTConfig(BaseSettings):
     ynab_category_id: str
     healthcheck_url: str | None = Field(default=None)
     kwh_rate: float
+    # After this day of the month, skip runs once the month has succeeded
+    skip_after_day: int = Field(default=3)
     model_config = SettingsConfigDict(env_file=".env")
+
+
+@lru_cache(maxsize=1)
+def get_config() -> SMTConfig:
+    """Return the process-wide config, parsing the environment only once."""
+    return SMTConfig()  # type: ignore
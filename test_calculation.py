@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """
-Unit tests for the Lambda function's calculate_trailing_12_month_average function.
-This ensures the pure Python implementation matches the expected behavior.
+Unit tests for the trailing 12-month average calculation.
+Covers the reference implementation on the pydantic models and the Lambda's
+raw-payload path (extract_month_totals + average_month_totals).
 """
 
 import sys
 import os
+import heapq
 from datetime import datetime
 from collections import defaultdict
 
@@ -13,6 +15,10 @@ from collections import defaultdict
 sys.path.insert(0, os.path.dirname(__file__))
 
 from models import MonthlyBillingDataResponse, Data, BillingData
+from lambda_function import average_month_totals, extract_month_totals
+
+# Demand fields the calculation never reads; shared by every test entry
+COMMON_FIELDS = dict(metered_kw=10.0, billed_kw=10.0, metered_kva=10.0, billed_kva=10.0)
 
 
 def calculate_trailing_12_month_average_test(report: MonthlyBillingDataResponse) -> float:
@@ -26,71 +32,53 @@ def calculate_trailing_12_month_average_test(report: MonthlyBillingDataResponse)
     if not billing_data:
         return 0.0
     
-    # Group data by month (YYYY-MM format)
+    # Group data by month, keyed by months since year 0 so keys sort in order
     monthly_usage = defaultdict(float)
     for bd in billing_data:
-        month_key = bd.start_date.strftime("%Y-%m")
+        month_key = bd.start_date.year * 12 + bd.start_date.month - 1
         monthly_usage[month_key] += bd.actual_kwh
     
-    # Sort months chronologically
-    sorted_months = sorted(monthly_usage.items())
-    
-    if not sorted_months:
-        return 0.0
-    
-    # Calculate trailing 12-month averages for each month
-    trailing_averages = {}
-    for i in range(len(sorted_months)):
-        month, _ = sorted_months[i]
-        # Get the last 12 months including current month
-        start_idx = max(0, i - 11)
-        window_data = sorted_months[start_idx:i + 1]
-        
-        if len(window_data) >= 12:
-            avg_kwh = sum(kwh for _, kwh in window_data) / 12
-            trailing_averages[month] = avg_kwh
-    
-    if not trailing_averages:
+    if len(monthly_usage) < 12:
         # If we don't have 12 months of data yet, return 0
         return 0.0
     
-    # Get the latest month's trailing average
-    latest_month = sorted_months[-1][0]
-    latest_avg = trailing_averages.get(latest_month, 0.0)
-    
-    return float(latest_avg)
+    # Only the latest month's window is ever returned, so pick the 12 most
+    # recent months without sorting the rest
+    latest_months = heapq.nlargest(12, monthly_usage.items())
+    return sum(kwh for _, kwh in latest_months) / 12.0
+
+
+def _make_response(entries):
+    """Build a report from (date, kWh) pairs, one billing entry per pair."""
+    billing_data_list = [
+        BillingData(
+            start_date=date,
+            end_date=date,
+            revision_date=date,
+            actual_kwh=kwh,
+            **COMMON_FIELDS
+        )
+        for date, kwh in entries
+    ]
+    data = Data(
+        trans_id="test-123",
+        esiid="test-esiid",
+        billing_data=billing_data_list
+    )
+    return MonthlyBillingDataResponse(data=data)
 
 
 def test_calculate_trailing_12_month_average():
     """Test the trailing 12-month average calculation with sample data."""
     
     # Create sample billing data for 13 months
-    billing_data_list = []
     base_kwh = 1000.0
-    
+    entries = []
     for i in range(13):
         month_offset = 13 - i  # Start 13 months ago
-        date_str = f"{2024 - (month_offset // 12):04d}-{(month_offset % 12) or 12:02d}-01"
-        
-        bd = BillingData(
-            start_date=datetime.strptime(date_str, "%Y-%m-%d"),
-            end_date=datetime.strptime(date_str, "%Y-%m-%d"),
-            revision_date=datetime.strptime(f"{date_str} 00:00:00", "%Y-%m-%d %H:%M:%S"),
-            actual_kwh=base_kwh + (i * 10),  # Gradually increasing usage
-            metered_kw=10.0,
-            billed_kw=10.0,
-            metered_kva=10.0,
-            billed_kva=10.0
-        )
-        billing_data_list.append(bd)
-    
-    # Create response object
-    data = Data(
-        trans_id="test-123",
-        esiid="test-esiid",
-        billing_data=billing_data_list
-    )
-    response = MonthlyBillingDataResponse(data=data)
+        date = datetime(2024 - (month_offset // 12), (month_offset % 12) or 12, 1)
+        entries.append((date, base_kwh + (i * 10)))  # Gradually increasing usage
+    response = _make_response(entries)
     
     # Calculate average
     average = calculate_trailing_12_month_average_test(response)
@@ -113,27 +101,8 @@ def test_calculate_trailing_12_month_average():
 def test_less_than_12_months():
     """Test with less than 12 months of data."""
     
-    billing_data_list = []
-    for i in range(6):  # Only 6 months
-        date_str = f"2024-{i+1:02d}-01"
-        bd = BillingData(
-            start_date=datetime.strptime(date_str, "%Y-%m-%d"),
-            end_date=datetime.strptime(date_str, "%Y-%m-%d"),
-            revision_date=datetime.strptime(f"{date_str} 00:00:00", "%Y-%m-%d %H:%M:%S"),
-            actual_kwh=1000.0,
-            metered_kw=10.0,
-            billed_kw=10.0,
-            metered_kva=10.0,
-            billed_kva=10.0
-        )
-        billing_data_list.append(bd)
-    
-    data = Data(
-        trans_id="test-123",
-        esiid="test-esiid",
-        billing_data=billing_data_list
-    )
-    response = MonthlyBillingDataResponse(data=data)
+    # Only 6 months
+    response = _make_response((datetime(2024, i + 1, 1), 1000.0) for i in range(6))
     
     average = calculate_trailing_12_month_average_test(response)
     
@@ -145,12 +114,7 @@ def test_less_than_12_months():
 def test_empty_data():
     """Test with empty billing data."""
     
-    data = Data(
-        trans_id="test-123",
-        esiid="test-esiid",
-        billing_data=[]
-    )
-    response = MonthlyBillingDataResponse(data=data)
+    response = _make_response([])
     
     average = calculate_trailing_12_month_average_test(response)
     
@@ -162,29 +126,9 @@ def test_empty_data():
 def test_multiple_entries_per_month():
     """Test with multiple billing entries in the same month (should be summed)."""
     
-    billing_data_list = []
-    # Add 2 entries for each of 12 months
-    for month in range(1, 13):
-        for entry in range(2):
-            date_str = f"2024-{month:02d}-01"
-            bd = BillingData(
-                start_date=datetime.strptime(date_str, "%Y-%m-%d"),
-                end_date=datetime.strptime(date_str, "%Y-%m-%d"),
-                revision_date=datetime.strptime(f"{date_str} 00:00:00", "%Y-%m-%d %H:%M:%S"),
-                actual_kwh=500.0,  # Each entry is 500 kWh
-                metered_kw=10.0,
-                billed_kw=10.0,
-                metered_kva=10.0,
-                billed_kva=10.0
-            )
-            billing_data_list.append(bd)
-    
-    data = Data(
-        trans_id="test-123",
-        esiid="test-esiid",
-        billing_data=billing_data_list
-    )
-    response = MonthlyBillingDataResponse(data=data)
+    # Add 2 entries of 500 kWh for each of 12 months
+    dates = [datetime(2024, month, 1) for month in range(1, 13)]
+    response = _make_response((date, 500.0) for date in dates for _ in range(2))
     
     average = calculate_trailing_12_month_average_test(response)
     
@@ -195,6 +139,126 @@ def test_multiple_entries_per_month():
     print("✅ Test passed!")
 
 
+def _make_payload(entries):
+    """Build a raw SMT monthly report payload from (date, kWh) pairs."""
+    return {
+        "data": {
+            "trans_id": "test-123",
+            "esiid": "test-esiid",
+            "billingData": [
+                {"startDate": date.strftime("%m/%d/%Y"), "actualkWh": kwh}
+                for date, kwh in entries
+            ],
+        }
+    }
+
+
+def _raw_average(entries):
+    """Run the Lambda's raw-payload calculation on (date, kWh) pairs."""
+    return average_month_totals(extract_month_totals(_make_payload(entries)))
+
+
+def test_raw_less_than_12_months():
+    """Test the raw-payload path with less than 12 months of data."""
+    
+    average = _raw_average((datetime(2024, month, 1), 1000.0) for month in range(1, 12))
+    
+    print(f"Raw average with < 12 months: {average:.2f} kWh")
+    assert average == 0.0, "Should return 0.0 when less than 12 months"
+    print("✅ Test passed!")
+
+
+def test_raw_multiple_entries_per_month():
+    """Test the raw-payload path sums several rows in the same month."""
+    
+    entries = [
+        (datetime(2024, month, day), 500.0)
+        for month in range(1, 13)
+        for day in (1, 15)
+    ]
+    
+    totals = extract_month_totals(_make_payload(entries))
+    assert len(totals) == 12, f"Expected 12 months, got {len(totals)}"
+    march = 2024 * 12 + 2
+    assert totals[march] == 1000.0, f"Expected 1000.0, got {totals[march]}"
+    
+    average = _raw_average(entries)
+    print(f"Raw average with multiple entries per month: {average:.2f} kWh")
+    assert abs(average - 1000.0) < 0.01, f"Expected 1000.0, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+def test_raw_more_than_12_months():
+    """Test the raw-payload path only averages the latest 12 of 18 months."""
+    
+    # Oldest six months are far larger, so including any of them would show
+    entries = [(datetime(2023, month, 1), 9000.0) for month in range(1, 7)]
+    entries += [(datetime(2023, month, 1), 1000.0) for month in range(7, 13)]
+    entries += [(datetime(2024, month, 1), 2000.0) for month in range(1, 7)]
+    
+    average = _raw_average(entries)
+    print(f"Raw average with 18 months: {average:.2f} kWh")
+    assert abs(average - 1500.0) < 0.01, f"Expected 1500.0, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+def test_raw_year_boundary():
+    """Test the raw-payload path orders months across a year boundary."""
+    
+    # January 2023 is the oldest of 13 months and must be the one dropped,
+    # even though January 2024 shares its month number
+    entries = [(datetime(2023, 1, 1), 9000.0)]
+    entries += [(datetime(2023, month, 1), 1000.0) for month in range(2, 13)]
+    entries += [(datetime(2024, 1, 1), 2200.0)]
+    
+    average = _raw_average(entries)
+    print(f"Raw average across a year boundary: {average:.2f} kWh")
+    assert abs(average - 1100.0) < 0.01, f"Expected 1100.0, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+def test_raw_unsorted_rows():
+    """Test the raw-payload path does not depend on row order."""
+    
+    entries = [(datetime(2023, 1, 1), 9000.0)]
+    entries += [
+        (datetime(2023 + (month // 12), month % 12 + 1, day), 600.0)
+        for month in range(1, 13)
+        for day in (1, 20)
+    ]
+    # Newest first, with the two rows of each month split apart
+    shuffled = entries[::-2] + entries[-2::-2]
+    
+    average = _raw_average(shuffled)
+    print(f"Raw average with unsorted rows: {average:.2f} kWh")
+    assert abs(average - 1200.0) < 0.01, f"Expected 1200.0, got {average:.2f}"
+    assert average == _raw_average(entries), "Row order should not change the result"
+    print("✅ Test passed!")
+
+
+def test_raw_malformed_date():
+    """Test the raw-payload path rejects a startDate it can't read."""
+    
+    entries = [(datetime(2024, month, 1), 1000.0) for month in range(1, 13)]
+    payload = _make_payload(entries)
+    
+    # Unpadded dates are fine and land in the right month
+    payload["data"]["billingData"].append({"startDate": "1/5/2024", "actualkWh": 1.0})
+    totals = extract_month_totals(payload)
+    january = 2024 * 12
+    assert totals[january] == 1001.0, f"Expected 1001.0, got {totals[january]}"
+    
+    # Any other layout raises instead of producing a bogus month
+    for bad_date in ("01/05/24", "2024-01-05", "13/05/2024"):
+        payload["data"]["billingData"][-1]["startDate"] = bad_date
+        try:
+            extract_month_totals(payload)
+        except ValueError:
+            continue
+        raise AssertionError(f"Expected {bad_date!r} to be rejected")
+    print("✅ Test passed!")
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Testing calculate_trailing_12_month_average")
@@ -218,6 +282,30 @@ if __name__ == "__main__":
         test_multiple_entries_per_month()
         print()
         
+        print("Test 5: Raw payload with less than 12 months of data")
+        test_raw_less_than_12_months()
+        print()
+        
+        print("Test 6: Raw payload with multiple entries per month")
+        test_raw_multiple_entries_per_month()
+        print()
+        
+        print("Test 7: Raw payload with more than 12 months of data")
+        test_raw_more_than_12_months()
+        print()
+        
+        print("Test 8: Raw payload across a year boundary")
+        test_raw_year_boundary()
+        print()
+        
+        print("Test 9: Raw payload with unsorted rows")
+        test_raw_unsorted_rows()
+        print()
+        
+        print("Test 10: Raw payload with a malformed date")
+        test_raw_malformed_date()
+        print()
+        
         print("=" * 60)
         print("✅ All tests passed!")
         print("=" * 60)
@@ -18,10 +18,11 @@ Make sure to set the required environment variables before running:
 
 import json
 import sys
-from lambda_function import lambda_handler
 
 def test_lambda_locally():
     """Test the Lambda function locally."""
+    # Imported here so loading this module doesn't pull in the Lambda's deps
+    from lambda_function import lambda_handler
     
     # Mock EventBridge event
     event = {
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the state the Lambda keeps between warm invocations.
+The SMT fetch, the YNAB PATCH and the healthcheck pings are stubbed, and
+STATE_FILE points at a temporary directory, so no credentials are needed.
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import lambda_function
+
+CONFIG = SimpleNamespace(
+    kwh_rate=0.15,
+    ynab_budget_id="test-budget",
+    ynab_category_id="test-category",
+    healthcheck_url=None,
+    skip_after_day=3,
+)
+
+# 12 months of 1000 kWh, so the trailing average is 1000 kWh
+PAYLOAD = {
+    "data": {
+        "billingData": [
+            {"startDate": f"{month:02d}/01/2024", "actualkWh": 1000.0}
+            for month in range(1, 13)
+        ]
+    }
+}
+EXPECTED_GOAL_TARGET = int(1000.0 * CONFIG.kwh_rate * 1000)
+
+
+@contextmanager
+def _patched_lambda(state=None, update_ok=True, payload=PAYLOAD):
+    """
+    Stub out SMT, YNAB and the healthcheck, with STATE_FILE in a temp directory.
+    Yields the update_category_targets mock and the list of pinged suffixes.
+    """
+    pings = []
+
+    async def fake_report(session):
+        return payload
+
+    async def fake_ping(session, suffix=""):
+        pings.append(suffix)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_file = Path(tmp_dir) / "state.json"
+        if state is not None:
+            state_file.write_text(json.dumps(state))
+        with mock.patch.object(lambda_function, "STATE_FILE", state_file), \
+                mock.patch.object(lambda_function, "get_config", return_value=CONFIG), \
+                mock.patch.object(lambda_function, "get_monthly_report", fake_report), \
+                mock.patch.object(lambda_function, "ping_healthcheck", fake_ping), \
+                mock.patch.object(
+                    lambda_function, "update_category_targets", return_value=update_ok
+                ) as update:
+            yield update, pings
+
+
+def test_changed_target_updates_and_records_month():
+    """Test that a new target is sent to YNAB and saved with the current month."""
+
+    with _patched_lambda(state={"goal_target": 1}) as (update, pings):
+        result = asyncio.run(lambda_function.process_data(None))
+        state = lambda_function.load_state()
+
+    assert result["statusCode"] == 200, f"Expected 200, got {result['statusCode']}"
+    assert update.call_count == 1, "Expected one YNAB update"
+    (category_id, goal_target, _note), = update.call_args.args[0]
+    assert category_id == CONFIG.ynab_category_id
+    assert goal_target == EXPECTED_GOAL_TARGET, f"Unexpected goal target {goal_target}"
+    assert state["goal_target"] == EXPECTED_GOAL_TARGET
+    assert state["last_success_month"] == datetime.now().strftime("%Y-%m")
+    assert pings == ["/start", ""], f"Unexpected pings {pings}"
+    print("✅ Test passed!")
+
+
+def test_unchanged_target_skips_update():
+    """Test that the PATCH is skipped when YNAB already holds the target."""
+
+    with _patched_lambda(state={"goal_target": EXPECTED_GOAL_TARGET}) as (update, pings):
+        result = asyncio.run(lambda_function.process_data(None))
+        state = lambda_function.load_state()
+
+    assert result["statusCode"] == 200, f"Expected 200, got {result['statusCode']}"
+    assert not update.called, "YNAB should not be updated with an unchanged target"
+    assert state["last_success_month"] == datetime.now().strftime("%Y-%m")
+    assert pings == ["/start", ""], f"Unexpected pings {pings}"
+    print("✅ Test passed!")
+
+
+def test_failed_update_does_not_record_month():
+    """Test that a failed PATCH reports failure and leaves the state untouched."""
+
+    with _patched_lambda(update_ok=False) as (update, pings):
+        result = asyncio.run(lambda_function.process_data(None))
+        state = lambda_function.load_state()
+
+    assert result["statusCode"] == 500, f"Expected 500, got {result['statusCode']}"
+    assert update.call_count == 1, "Expected one YNAB update attempt"
+    assert "last_success_month" not in state, "Failed run should not be recorded"
+    assert "goal_target" not in state, "Failed target should not be recorded"
+    assert pings == ["/start", "/fail"], f"Unexpected pings {pings}"
+    print("✅ Test passed!")
+
+
+def test_malformed_date_fails_run():
+    """Test that an unreadable startDate reports failure instead of a bad average."""
+
+    rows = PAYLOAD["data"]["billingData"] + [{"startDate": "2024-01-05", "actualkWh": 1.0}]
+    with _patched_lambda(payload={"data": {"billingData": rows}}) as (update, pings):
+        result = asyncio.run(lambda_function.process_data(None))
+        state = lambda_function.load_state()
+
+    assert result["statusCode"] == 500, f"Expected 500, got {result['statusCode']}"
+    assert not update.called, "YNAB should not be updated from a malformed report"
+    assert state == {}, "Failed run should not be recorded"
+    assert pings == ["/start", "/fail"], f"Unexpected pings {pings}"
+    print("✅ Test passed!")
+
+
+def test_runs_on_or_before_skip_after_day():
+    """Test that runs up to skip_after_day go ahead even after a success."""
+
+    with _patched_lambda(state={"last_success_month": "2024-05"}):
+        for day in range(1, CONFIG.skip_after_day + 1):
+            assert not lambda_function.already_ran_this_month(datetime(2024, 5, day)), \
+                f"Run on day {day} should not be skipped"
+    print("✅ Test passed!")
+
+
+def test_skips_after_skip_after_day_once_month_succeeded():
+    """Test that runs after skip_after_day are skipped once the month succeeded."""
+
+    with _patched_lambda(state={"last_success_month": "2024-05"}):
+        now = datetime(2024, 5, CONFIG.skip_after_day + 1)
+        assert lambda_function.already_ran_this_month(now), \
+            "Run after the cutoff should be skipped"
+        # A success recorded for an earlier month does not count
+        assert not lambda_function.already_ran_this_month(datetime(2024, 6, 20)), \
+            "Run in a new month should not be skipped"
+    print("✅ Test passed!")
+
+
+def test_handler_skips_without_fetching():
+    """Test that lambda_handler returns early without contacting SMT or YNAB."""
+
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 5, 20)
+
+    with _patched_lambda(state={"last_success_month": "2024-05"}) as (update, pings), \
+            mock.patch.object(lambda_function, "datetime", FixedDatetime), \
+            mock.patch.object(lambda_function, "get_monthly_report") as report:
+        result = lambda_function.lambda_handler({}, None)
+
+    assert result["statusCode"] == 200, f"Expected 200, got {result['statusCode']}"
+    assert "skipped" in json.loads(result["body"])["message"]
+    assert not report.called, "SMT should not be contacted on a skipped run"
+    assert not update.called, "YNAB should not be updated on a skipped run"
+    print("✅ Test passed!")
+
+
+def test_failed_report_request_drops_cached_client():
+    """Test that a failed SMT request clears the cached client and meter ID."""
+
+    session = object()
+    client = mock.Mock(websession=session)
+    client.request = mock.AsyncMock(side_effect=RuntimeError("401 Unauthorized"))
+
+    with mock.patch.object(lambda_function, "_SMT_CLIENT", client), \
+            mock.patch.object(lambda_function, "_METER_ID", "test-esiid"):
+        try:
+            asyncio.run(lambda_function.get_monthly_report(session))
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("The request error should propagate")
+        assert lambda_function._SMT_CLIENT is None, "Cached client should be dropped"
+        assert lambda_function._METER_ID is None, "Cached meter ID should be dropped"
+    print("✅ Test passed!")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing Lambda state handling")
+    print("=" * 60)
+    print()
+
+    try:
+        print("Test 1: Changed target updates YNAB and records the month")
+        test_changed_target_updates_and_records_month()
+        print()
+
+        print("Test 2: Unchanged target skips the YNAB update")
+        test_unchanged_target_skips_update()
+        print()
+
+        print("Test 3: Failed YNAB update does not record the month")
+        test_failed_update_does_not_record_month()
+        print()
+
+        print("Test 4: Malformed date fails the run")
+        test_malformed_date_fails_run()
+        print()
+
+        print("Test 5: Runs up to skip_after_day always go ahead")
+        test_runs_on_or_before_skip_after_day()
+        print()
+
+        print("Test 6: Runs after skip_after_day are skipped once the month succeeded")
+        test_skips_after_skip_after_day_once_month_succeeded()
+        print()
+
+        print("Test 7: lambda_handler skips without fetching")
+        test_handler_skips_without_fetching()
+        print()
+
+        print("Test 8: Failed SMT request drops the cached client")
+        test_failed_report_request_drops_cached_client()
+        print()
+
+        print("=" * 60)
+        print("✅ All tests passed!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Test failed: {e}")
+        print("=" * 60)
+        exit(1)
+    except Exception as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        print("=" * 60)
+        exit(1)
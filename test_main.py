@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Unit tests for main.py's calculate_trailing_12_month_average, the
+calculation the Docker/cron path runs on the pydantic models.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from models import MonthlyBillingDataResponse, Data, BillingData
+from main import calculate_trailing_12_month_average
+
+# Demand fields the calculation never reads; shared by every test entry
+COMMON_FIELDS = dict(metered_kw=10.0, billed_kw=10.0, metered_kva=10.0, billed_kva=10.0)
+
+
+def _make_response(entries):
+    """Build a report from (date, kWh) pairs, one billing entry per pair."""
+    billing_data_list = [
+        BillingData(
+            start_date=date,
+            end_date=date,
+            revision_date=date,
+            actual_kwh=kwh,
+            **COMMON_FIELDS
+        )
+        for date, kwh in entries
+    ]
+    data = Data(
+        trans_id="test-123",
+        esiid="test-esiid",
+        billing_data=billing_data_list
+    )
+    return MonthlyBillingDataResponse(data=data)
+
+
+def test_latest_12_of_13_months():
+    """Test that only the latest 12 of 13 months are averaged."""
+
+    # 1000, 1010, ..., 1120 kWh from 13 months ago up to the latest month
+    entries = [
+        (datetime(2023 + (i // 12), i % 12 + 1, 1), 1000.0 + i * 10)
+        for i in range(13)
+    ]
+    average = calculate_trailing_12_month_average(_make_response(entries))
+
+    expected_average = sum(1000.0 + i * 10 for i in range(1, 13)) / 12
+    print(f"Average of the latest 12 months: {average:.2f} kWh")
+    assert abs(average - expected_average) < 0.01, \
+        f"Expected {expected_average:.2f}, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+def test_less_than_12_months():
+    """Test with less than 12 months of data."""
+
+    entries = [(datetime(2024, month, 1), 1000.0) for month in range(1, 12)]
+    average = calculate_trailing_12_month_average(_make_response(entries))
+
+    print(f"Average with < 12 months: {average:.2f} kWh")
+    assert average == 0.0, "Should return 0.0 when less than 12 months"
+    print("✅ Test passed!")
+
+
+def test_empty_data():
+    """Test with empty billing data."""
+
+    average = calculate_trailing_12_month_average(_make_response([]))
+
+    print(f"Average with empty data: {average:.2f} kWh")
+    assert average == 0.0, "Should return 0.0 for empty data"
+    print("✅ Test passed!")
+
+
+def test_multiple_entries_per_month():
+    """Test with multiple billing entries in the same month (should be summed)."""
+
+    entries = [
+        (datetime(2024, month, day), 500.0)
+        for month in range(1, 13)
+        for day in (1, 15)
+    ]
+    average = calculate_trailing_12_month_average(_make_response(entries))
+
+    print(f"Average with multiple entries per month: {average:.2f} kWh")
+    assert abs(average - 1000.0) < 0.01, f"Expected 1000.0, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+def test_unsorted_entries_across_year_boundary():
+    """Test that row order and a year boundary don't change the grouping."""
+
+    # January 2023 is the oldest of 13 months and must be the one dropped;
+    # the two rows of each month are split apart and listed newest first
+    entries = [(datetime(2023, 1, 1), 9000.0)]
+    entries += [
+        (datetime(2023 + (month // 12), month % 12 + 1, day), 600.0)
+        for month in range(1, 13)
+        for day in (1, 20)
+    ]
+    response = _make_response(entries[::-2] + entries[-2::-2])
+
+    average = calculate_trailing_12_month_average(response)
+
+    print(f"Average with unsorted entries: {average:.2f} kWh")
+    assert abs(average - 1200.0) < 0.01, f"Expected 1200.0, got {average:.2f}"
+    print("✅ Test passed!")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing main.calculate_trailing_12_month_average")
+    print("=" * 60)
+    print()
+
+    try:
+        print("Test 1: Latest 12 of 13 months")
+        test_latest_12_of_13_months()
+        print()
+
+        print("Test 2: Less than 12 months of data")
+        test_less_than_12_months()
+        print()
+
+        print("Test 3: Empty data")
+        test_empty_data()
+        print()
+
+        print("Test 4: Multiple entries per month")
+        test_multiple_entries_per_month()
+        print()
+
+        print("Test 5: Unsorted entries across a year boundary")
+        test_unsorted_entries_across_year_boundary()
+        print()
+
+        print("=" * 60)
+        print("✅ All tests passed!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Test failed: {e}")
+        print("=" * 60)
+        exit(1)
+    except Exception as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        print("=" * 60)
+        exit(1)
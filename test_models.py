@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the SMT date parsing in models.py.
+Raw strings go through BillingData.model_validate, as they do for a real
+SMT response, and are checked against what strptime accepted before.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from pydantic import ValidationError
+
+from models import BillingData
+
+RAW_ENTRY = {
+    "startDate": "01/15/2024",
+    "endDate": "02/14/2024",
+    "revisionDate": "02/16/2024 13:45:07",
+    "actualkWh": "1234.5",
+    "meteredKW": "10.0",
+    "billedKW": "10.0",
+    "meteredKVA": "10.0",
+    "billedKVA": "10.0",
+}
+
+
+def _assert_rejected(**overrides):
+    """Check that validating RAW_ENTRY with the given fields replaced fails."""
+    try:
+        BillingData.model_validate({**RAW_ENTRY, **overrides})
+    except ValidationError:
+        return
+    raise AssertionError(f"Expected {overrides} to be rejected")
+
+
+def test_valid_dates():
+    """Test that well-formed dates and timestamps parse like strptime did."""
+
+    bd = BillingData.model_validate(RAW_ENTRY)
+
+    assert bd.start_date == datetime.strptime("01/15/2024", "%m/%d/%Y")
+    assert bd.end_date == datetime(2024, 2, 14)
+    assert bd.revision_date == datetime.strptime(
+        "02/16/2024 13:45:07", "%m/%d/%Y %H:%M:%S"
+    )
+    assert bd.actual_kwh == 1234.5
+    print("✅ Test passed!")
+
+
+def test_unpadded_date_is_accepted():
+    """Test that single-digit month and day fields still parse, as with strptime."""
+
+    bd = BillingData.model_validate(
+        {**RAW_ENTRY, "startDate": "1/5/2024", "revisionDate": "2/6/2024 3:04:05"}
+    )
+
+    assert bd.start_date == datetime.strptime("1/5/2024", "%m/%d/%Y")
+    assert bd.revision_date == datetime(2024, 2, 6, 3, 4, 5)
+    print("✅ Test passed!")
+
+
+def test_two_digit_year_is_rejected():
+    """Test that a two-digit year is not read as year 24."""
+
+    _assert_rejected(startDate="01/15/24")
+    _assert_rejected(revisionDate="02/16/24 13:45:07")
+    print("✅ Test passed!")
+
+
+def test_out_of_range_month_is_rejected():
+    """Test that a month outside 1-12 is rejected."""
+
+    _assert_rejected(startDate="13/01/2024")
+    _assert_rejected(revisionDate="13/16/2024 13:45:07")
+    print("✅ Test passed!")
+
+
+def test_wrong_separators_are_rejected():
+    """Test that other date layouts fail instead of being sliced apart."""
+
+    _assert_rejected(startDate="2024-01-15")
+    _assert_rejected(endDate="01-15-2024")
+    _assert_rejected(revisionDate="02/16/2024T13:45:07")
+    print("✅ Test passed!")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Testing SMT date parsing")
+    print("=" * 60)
+    print()
+
+    try:
+        print("Test 1: Valid dates and timestamps")
+        test_valid_dates()
+        print()
+
+        print("Test 2: Unpadded dates are accepted")
+        test_unpadded_date_is_accepted()
+        print()
+
+        print("Test 3: Two-digit years are rejected")
+        test_two_digit_year_is_rejected()
+        print()
+
+        print("Test 4: Out-of-range months are rejected")
+        test_out_of_range_month_is_rejected()
+        print()
+
+        print("Test 5: Wrong separators are rejected")
+        test_wrong_separators_are_rejected()
+        print()
+
+        print("=" * 60)
+        print("✅ All tests passed!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Test failed: {e}")
+        print("=" * 60)
+        exit(1)
+    except Exception as e:
+        print()
+        print("=" * 60)
+        print(f"❌ Unexpected error: {e}")
+        import traceback
+        traceback.print_exc()
+        print("=" * 60)
+        exit(1)